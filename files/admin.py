@@ -1,6 +1,7 @@
 import re
 from django import forms
 from django.contrib import admin
+from django.db.models import Count
 from tinymce.widgets import TinyMCE
 
 from users.models import User
@@ -31,6 +32,7 @@ from .models import (
 class CommentAdmin(admin.ModelAdmin):
     search_fields = ["text"]
     list_display = ["text", "add_date", "user", "media"]
+    list_select_related = ["user", "media"]
     ordering = ("-add_date",)
     readonly_fields = ("user", "media", "parent")
 
@@ -74,10 +76,21 @@ class MediaAdmin(admin.ModelAdmin):
     get_file_size.short_description = "File Size"
     get_file_size.admin_order_field = "size"  # Allow sorting by this column
 
+    def get_queryset(self, request):
+        # count the comments of the listed media with the listing query
+        # instead of a COUNT query per row
+        return (
+            super(MediaAdmin, self)
+            .get_queryset(request)
+            .select_related("user")
+            .annotate(comments_count=Count("comments", distinct=True))
+        )
+
     def get_comments_count(self, obj):
-        return obj.comments.count()
+        return obj.comments_count
 
     get_comments_count.short_description = "Comments count"
+    get_comments_count.admin_order_field = "comments_count"
 
     def get_form(self, request, obj=None, **kwargs):
         form = super(MediaAdmin, self).get_form(request, obj, **kwargs)
@@ -117,6 +130,7 @@ class LanguageAdmin(admin.ModelAdmin):
 
 class SubtitleAdmin(admin.ModelAdmin):
     list_filter = ["language"]
+    list_select_related = ["media", "language"]
 
 
 class RatingCategoryAdmin(admin.ModelAdmin):
@@ -128,6 +142,7 @@ class RatingCategoryAdmin(admin.ModelAdmin):
 class RatingAdmin(admin.ModelAdmin):
     search_fields = ["user"]
     list_display = ["user", "rating_category", "media"]
+    list_select_related = ["user", "rating_category", "media"]
     list_filter = ["rating_category"]
 
 
@@ -206,8 +221,7 @@ class TranscriptionRequestAdmin(admin.ModelAdmin):
         if obj.media and obj.media.media_language:
             # Get the display name from the choices
             from . import lists
-            language_dict = dict(lists.video_languages)
-            return language_dict.get(obj.media.media_language, obj.media.media_language)
+            return lists.video_languages_by_code.get(obj.media.media_language, obj.media.media_language)
         return "Not specified"
     language.short_description = "Language"
     
@@ -216,8 +230,7 @@ class TranscriptionRequestAdmin(admin.ModelAdmin):
         if obj.media and obj.media.media_country:
             # Get the display name from the choices
             from . import lists
-            country_dict = dict(lists.video_countries)
-            return country_dict.get(obj.media.media_country, obj.media.media_country)
+            return lists.video_countries_by_code.get(obj.media.media_country, obj.media.media_country)
         return "Not specified"
     country.short_description = "Country"
     
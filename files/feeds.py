@@ -124,14 +124,10 @@ class SearchRSSFeed(Feed):
         elif topic:
             media = media.filter(topics__title__contains=topic)
         elif language:
-            language = {
-                value: key for key, value in dict(lists.video_languages).items()
-            }.get(language)
+            language = lists.video_languages_by_title.get(language)
             media = media.filter(media_language=language)
         elif country:
-            country = {
-                value: key for key, value in dict(lists.video_countries).items()
-            }.get(country)
+            country = lists.video_countries_by_title.get(country)
             media = media.filter(media_country=country)
         elif query:
             query = helpers.clean_query(query)
@@ -136,12 +136,12 @@ def get_file_type(filename):
 
 
 def rm_file(filename):
-    if os.path.isfile(filename):
-        try:
-            os.remove(filename)
-            return True
-        except OSError:
-            pass
+    # a single unlink, missing files and directories raise OSError
+    try:
+        os.remove(filename)
+        return True
+    except OSError:
+        pass
     return False
 
 
@@ -171,6 +171,12 @@ def url_from_path(filename):
     )
 
 
+def url_from_file_name(name):
+    # same result as url_from_path(field.path) for a FileField stored
+    # under MEDIA_ROOT, without resolving the path through the storage
+    return "{0}{1}".format(settings.MEDIA_URL, name.replace(settings.MEDIA_ROOT, ""))
+
+
 def build_versioned_url(base_url, version):
     """Build a versioned URL with proper query parameter handling"""
     if not base_url:
@@ -209,6 +215,20 @@ def mask_ip(ip_address):
     return hashlib.md5(ip_address.encode("utf-8")).hexdigest()
 
 
+def file_md5sum(input_file, chunk_size=1024 * 1024):
+    """Compute the md5 of a file in process, reading it in chunks
+    Returns None if the file cannot be read
+    """
+    md5 = hashlib.md5()
+    try:
+        with open(input_file, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                md5.update(chunk)
+    except OSError:
+        return None
+    return md5.hexdigest()
+
+
 def run_command(cmd, cwd=None):
     """
     Run a command directly
@@ -138,3 +138,10 @@ license_options = (
     ("No", "No"),
     ("Partially", "Partially"),
 )
+
+# title lookups by code and code lookups by title,
+# built once instead of on every call
+video_languages_by_code = dict(video_languages)
+video_countries_by_code = dict(video_countries)
+video_languages_by_title = {value: key for key, value in video_languages}
+video_countries_by_title = {value: key for key, value in video_countries}
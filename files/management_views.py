@@ -117,7 +117,7 @@ class CommentList(APIView):
 
         pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
 
-        qs = Comment.objects.filter()
+        qs = Comment.objects.filter().select_related("user", "media")
         media = qs.order_by(f"{ordering}{sort_by}")
 
         paginator = pagination_class()
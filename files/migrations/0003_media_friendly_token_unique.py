@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-15 22:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='media',
+            name='friendly_token',
+            field=models.CharField(blank=True, db_index=True, max_length=12, unique=True),
+        ),
+    ]
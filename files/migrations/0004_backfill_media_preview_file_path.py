@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-15 23:10
+
+from django.db import migrations
+
+
+def backfill_preview_file_path(apps, schema_editor):
+    # Media.preview_url no longer falls back to querying the gif encoding,
+    # so store its path on the media that have one but no preview_file_path
+    Media = apps.get_model("files", "Media")
+    Encoding = apps.get_model("files", "Encoding")
+    encodings = (
+        Encoding.objects.filter(
+            profile__extension="gif", media__preview_file_path=""
+        )
+        .exclude(media_file="")
+        .order_by("id")
+    )
+    for encoding in encodings.iterator():
+        Media.objects.filter(id=encoding.media_id, preview_file_path="").update(
+            preview_file_path=encoding.media_file.path
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0003_media_friendly_token_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_preview_file_path, migrations.RunPython.noop),
+    ]
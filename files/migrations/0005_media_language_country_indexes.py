@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-15 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0004_backfill_media_preview_file_path'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(fields=['media_language', 'state', 'is_reviewed'], name='files_media_media_l_54cbe2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(fields=['media_country', 'state', 'is_reviewed'], name='files_media_media_c_e04da1_idx'),
+        ),
+    ]
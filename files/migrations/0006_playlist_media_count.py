@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-16 00:05
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_media_count(apps, schema_editor):
+    Playlist = apps.get_model("files", "Playlist")
+    playlists = Playlist.objects.annotate(count=Count("playlistmedia")).filter(
+        count__gt=0
+    )
+    for playlist in playlists.iterator():
+        Playlist.objects.filter(id=playlist.id).update(media_count=playlist.count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0005_media_language_country_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playlist',
+            name='media_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_media_count, migrations.RunPython.noop),
+    ]
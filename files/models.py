@@ -1,3 +1,4 @@
+import functools
 import json
 import logging
 import os
@@ -10,10 +11,13 @@ import uuid
 
 import m3u8
 from django.conf import settings
+from django.contrib.postgres.aggregates import ArrayAgg, StringAgg
 from django.contrib.postgres.indexes import BrinIndex, BTreeIndex, GinIndex
 from django.contrib.postgres.search import SearchVectorField
 from django.core.files import File
-from django.db import connection, models
+from django.db import DatabaseError, IntegrityError, connection, models, transaction
+from django.db.models import Count, Exists, F, Max, Min, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.template.defaultfilters import slugify
@@ -79,8 +83,90 @@ CODECS = (
     ("vp9", "vp9"),
 )
 
-ENCODE_EXTENSIONS_KEYS = [extension for extension, name in ENCODE_EXTENSIONS]
-ENCODE_RESOLUTIONS_KEYS = [resolution for resolution, name in ENCODE_RESOLUTIONS]
+# Media fields whose text ends up in the search vector. Saves limited to
+# other fields (views, likes, encoding_status etc) don't need to refresh it
+SEARCH_VECTOR_FIELDS = (
+    "title",
+    "user",
+    "description",
+    "summary",
+    "media_language",
+    "media_country",
+    "website",
+    "company",
+)
+
+# Media fields needed to build thumbnail_url, for queries that only
+# want the thumbnail of a media (eg category/tag fallback thumbnails).
+# Media.__init__ reads the last five, they must not be deferred or each
+# media loads them with a query of its own
+THUMBNAIL_URL_FIELDS = (
+    "uploaded_thumbnail",
+    "thumbnail",
+    "edit_date",
+    "add_date",
+    "uid",
+    "media_file",
+    "thumbnail_time",
+    "uploaded_poster",
+    "state",
+    "password",
+)
+
+# Media fields that decide whether a media is counted in the media_count
+# of its categories/tags/topics/language/country. Saves limited to other
+# fields (views, likes, thumbnails etc) can't change any of these counts
+MEDIA_COUNT_FIELDS = (
+    "state",
+    "is_reviewed",
+    "encoding_status",
+    "media_country",
+    "media_language",
+)
+
+# Encoding fields read by the post_delete handler (and post_encode_actions).
+# Bulk deletes load only these, not the logs/commands of every row
+ENCODING_DELETE_FIELDS = ("media", "profile", "status", "media_file", "chunk")
+
+# how many times to retry the insert of a new Media/Playlist
+# in case its randomly generated friendly_token already exists
+FRIENDLY_TOKEN_SAVE_ATTEMPTS = 5
+
+ENCODE_EXTENSIONS_KEYS = tuple(extension for extension, name in ENCODE_EXTENSIONS)
+ENCODE_RESOLUTIONS_KEYS = tuple(resolution for resolution, name in ENCODE_RESOLUTIONS)
+
+
+class DraftResizeToFit(ResizeToFit):
+    """
+    ResizeToFit that lets Pillow decode JPEG sources at a reduced scale
+    (Image.draft) when the target is much smaller than the source, instead
+    of decoding the full size image only to downscale it afterwards
+    """
+
+    def process(self, img):
+        width, height = img.size
+        if self.width is not None and self.height is not None:
+            ratio = min(self.width / width, self.height / height)
+        elif self.width is None:
+            ratio = self.height / height
+        else:
+            ratio = self.width / width
+        if ratio < 1:
+            # keep a x2 margin so that the final LANCZOS resize still does
+            # part of the downscaling, as Image.thumbnail does by default
+            img.draft(None, (int(width * ratio * 2), int(height * ratio * 2)))
+        return super().process(img)
+
+
+class TemporaryFile(File):
+    """
+    File for a temp file that is not needed after it is saved. Like an
+    uploaded TemporaryUploadedFile, the storage moves it into place (a
+    rename when on the same filesystem) instead of copying its contents
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
 
 
 def original_media_file_path(instance, filename):
@@ -123,9 +209,83 @@ def topic_thumb_path(instance, filename):
     return settings.MEDIA_UPLOAD_DIR + "topics/{0}".format(file_name)
 
 
+@functools.lru_cache(maxsize=512)
+def load_hls_playlists(hls_file, mtime):
+    """Parse an HLS master playlist, return the (resolution, path) pairs
+    of its existing iframe playlists and playlists.
+    Results are cached per process, mtime is part of the key so that
+    a master file that is re-created gets parsed again
+    """
+    p = os.path.dirname(hls_file)
+    m3u8_obj = m3u8.load(hls_file)
+    iframe_playlists = []
+    for iframe_playlist in m3u8_obj.iframe_playlists:
+        uri = os.path.join(p, iframe_playlist.uri)
+        if os.path.exists(uri):
+            resolution = iframe_playlist.iframe_stream_info.resolution[1]
+            iframe_playlists.append((resolution, uri))
+    playlists = []
+    for playlist in m3u8_obj.playlists:
+        uri = os.path.join(p, playlist.uri)
+        if os.path.exists(uri):
+            resolution = playlist.stream_info.resolution[1]
+            playlists.append((resolution, uri))
+    return tuple(iframe_playlists), tuple(playlists)
+
+
+def save_with_friendly_token(instance, save, token_generated):
+    """
+    Runs save() of a Media/Playlist, and if the insert of a new object
+    fails on its generated friendly_token, picks another one and retries.
+    Inside a transaction the insert needs a savepoint to be retried, in
+    autocommit mode the failed insert is simply repeated. Updates run
+    save() as is
+    """
+    savepoint = (
+        token_generated and instance._state.adding and connection.in_atomic_block
+    )
+    for attempt in range(FRIENDLY_TOKEN_SAVE_ATTEMPTS):
+        try:
+            if savepoint:
+                with transaction.atomic():
+                    save()
+            else:
+                save()
+            return
+        except IntegrityError:
+            if (
+                not (token_generated and instance._state.adding)
+                or attempt == FRIENDLY_TOKEN_SAVE_ATTEMPTS - 1
+            ):
+                raise
+            instance.friendly_token = helpers.produce_friendly_token()
+
+
+class MediaQuerySet(models.QuerySet):
+    def for_listing(self):
+        # media_info (ffprobe output) and the search vector can be large
+        # and are not used by any of the listing serializers
+        return self.defer("media_info", "search")
+
+    def for_detail(self):
+        # load everything the *_info properties read, in a fixed number of
+        # queries instead of a few per relation
+        return self.select_related("user", "license").prefetch_related(
+            "encodings__profile",
+            "category",
+            "topics",
+            "tags",
+            models.Prefetch(
+                "subtitles", queryset=Subtitle.objects.select_related("language")
+            ),
+        )
+
+
 class Media(models.Model):
     uid = models.UUIDField(unique=True, default=uuid.uuid4)
-    friendly_token = models.CharField(blank=True, max_length=12, db_index=True)
+    friendly_token = models.CharField(
+        blank=True, max_length=12, db_index=True, unique=True
+    )
     title = models.CharField(max_length=100, blank=True, db_index=True)
     user = models.ForeignKey("users.User", on_delete=models.CASCADE, db_index=True)
     category = models.ManyToManyField("Category", blank=True)
@@ -164,7 +324,7 @@ class Media(models.Model):
     )
     thumbnail = ProcessedImageField(
         upload_to=original_thumbnail_file_path,
-        processors=[ResizeToFit(width=344, height=None)],
+        processors=[DraftResizeToFit(width=344, height=None)],
         format="JPEG",
         options={"quality": 95},
         blank=True,
@@ -172,7 +332,7 @@ class Media(models.Model):
     )
     poster = ProcessedImageField(
         upload_to=original_thumbnail_file_path,
-        processors=[ResizeToFit(width=1280, height=None)],
+        processors=[DraftResizeToFit(width=1280, height=None)],
         format="JPEG",
         options={"quality": 95},
         blank=True,
@@ -181,7 +341,7 @@ class Media(models.Model):
 
     uploaded_thumbnail = ProcessedImageField(
         upload_to=original_thumbnail_file_path,
-        processors=[ResizeToFit(width=344, height=None)],
+        processors=[DraftResizeToFit(width=344, height=None)],
         format="JPEG",
         options={"quality": 85},
         blank=True,
@@ -191,7 +351,7 @@ class Media(models.Model):
         verbose_name="Upload image",
         help_text="Image will appear as poster",
         upload_to=original_thumbnail_file_path,
-        processors=[ResizeToFit(width=720, height=None)],
+        processors=[DraftResizeToFit(width=720, height=None)],
         format="JPEG",
         options={"quality": 85},
         blank=True,
@@ -286,6 +446,8 @@ class Media(models.Model):
         "Translate to English", default=False
     )
 
+    objects = MediaQuerySet.as_manager()
+
     __original_media_file = None
     __original_thumbnail_time = None
     __original_uploaded_poster = None
@@ -300,6 +462,8 @@ class Media(models.Model):
             models.Index(fields=["state", "encoding_status", "is_reviewed", "title"]),
             models.Index(fields=["state", "encoding_status", "is_reviewed", "user"]),
             models.Index(fields=["views", "likes"]),
+            models.Index(fields=["media_language", "state", "is_reviewed"]),
+            models.Index(fields=["media_country", "state", "is_reviewed"]),
             GinIndex(fields=["search"]),
         ]
 
@@ -317,21 +481,23 @@ class Media(models.Model):
     def save(self, *args, **kwargs):
         if not self.title:
             self.title = self.media_file.path.split("/")[-1]
-        strip_text_items = ["title", "summary", "description"]
-        for item in strip_text_items:
-            setattr(self, item, strip_tags(getattr(self, item, None)))
-        self.title = self.title[:99]
+        for item in ("title", "summary", "description"):
+            value = getattr(self, item, None) or ""
+            if "<" in value:
+                value = strip_tags(value)
+            setattr(self, item, value)
+        if len(self.title) > 99:
+            self.title = self.title[:99]
         if self.thumbnail_time:
             self.thumbnail_time = round(self.thumbnail_time, 1)
 
         if not self.add_date:
             self.add_date = timezone.now()
+        token_generated = False
         if not self.friendly_token:
-            while True:
-                friendly_token = helpers.produce_friendly_token()
-                if not Media.objects.filter(friendly_token=friendly_token):
-                    self.friendly_token = friendly_token
-                    break
+            # uniqueness is enforced by the db, see the retry below
+            self.friendly_token = helpers.produce_friendly_token()
+            token_generated = True
 
         # TODO: regarding state. Allow a few transitions only
         # taking under consideration settings.PORTAL_WORKFLOW
@@ -354,7 +520,11 @@ class Media(models.Model):
         else:
             self.state = helpers.get_default_state(user=self.user)
             self.license = License.objects.filter(id=10).first()
-        super(Media, self).save(*args, **kwargs)
+        save_with_friendly_token(
+            self,
+            lambda: super(Media, self).save(*args, **kwargs),
+            token_generated,
+        )
 
         # Invalidate permission cache if state or password changed
         if self.pk and (self.state != self.__original_state or self.password != self.__original_password):
@@ -367,26 +537,34 @@ class Media(models.Model):
             self.uploaded_poster
             and self.uploaded_poster != self.__original_uploaded_poster
         ):
-            with open(self.uploaded_poster.path, "rb") as f:
-                self.__original_uploaded_poster = self.uploaded_poster
-                myfile = File(f)
-                thumbnail_name = helpers.get_file_name(self.uploaded_poster.path)
-                self.uploaded_thumbnail.save(content=myfile, name=thumbnail_name)
+            self.__original_uploaded_poster = self.uploaded_poster
+            # resizing the poster to a thumbnail can take a while,
+            # do not block the request on it
+            from . import tasks
+
+            friendly_token = self.friendly_token
+            transaction.on_commit(
+                lambda: tasks.produce_thumbnail_from_uploaded_poster.delay(
+                    friendly_token
+                )
+            )
 
     def transcribe_function(self):
         can_transcribe = False
         can_transcribe_and_translate = False
         if self.allow_whisper_transcribe or self.allow_whisper_transcribe_and_translate:
+            # which kinds of transcription requests already exist, in one query
+            requested = set(
+                TranscriptionRequest.objects.filter(media=self)
+                .values_list("translate_to_english", flat=True)
+                .distinct()
+            )
             if self.allow_whisper_transcribe_and_translate:
-                if not TranscriptionRequest.objects.filter(
-                    media=self, translate_to_english=True
-                ).exists():
+                if True not in requested:
                     can_transcribe_and_translate = True
 
             if self.allow_whisper_transcribe:
-                if not TranscriptionRequest.objects.filter(
-                    media=self, translate_to_english=False
-                ).exists():
+                if False not in requested:
                     can_transcribe = True
 
             from . import tasks
@@ -406,8 +584,9 @@ class Media(models.Model):
         # get the text for current SearchModel instance
         # that we are going to convert to tsvector
         if self.id:
-            a_tags = " ".join([tag.title for tag in self.tags.all()])
-            b_tags = " ".join([tag.title.replace("-", " ") for tag in self.tags.all()])
+            tag_titles = list(self.tags.values_list("title", flat=True))
+            a_tags = " ".join(tag_titles)
+            b_tags = " ".join([title.replace("-", " ") for title in tag_titles])
         else:
             a_tags = ""
             b_tags = ""
@@ -429,23 +608,25 @@ class Media(models.Model):
         items = [item for item in items if item]
         text = " ".join(items)
         text = " ".join(
-            [token for token in text.lower().split(" ") if token not in STOP_WORDS]
+            token for token in text.lower().split() if token not in STOP_WORDS
         )
 
         text = helpers.clean_query(text)
 
+        # only the table name is formatted in, values are passed as
+        # parameters so that the statement text stays the same across calls
         sql_code = """
             UPDATE {db_table} SET search = to_tsvector(
-                '{config}', '{text}'
-            ) WHERE {db_table}.id = {id}
+                %s::regconfig, %s
+            ) WHERE {db_table}.id = %s
             """.format(
-            db_table=db_table, config="simple", text=text, id=self.id
+            db_table=db_table
         )
         try:
             with connection.cursor() as cursor:
-                cursor.execute(sql_code)
-        except:
-            pass  # TODO:add log
+                cursor.execute(sql_code, ["simple", text, self.id])
+        except Exception as e:
+            logger.warning(f"Failed to update search vector for media {self.id}: {e}")
         return True
 
     def _invalidate_permission_cache(self):
@@ -559,13 +740,14 @@ class Media(models.Model):
             if self.media_type == "video":
                 self.produce_thumbnails_from_video()
             if self.media_type == "image":
+                thumbnail_name = helpers.get_file_name(self.media_file.path) + ".jpg"
+                # both out of the original, not the thumbnail out of the
+                # poster, that would JPEG compress it twice. Saves the
+                # model once, with the thumbnail
                 with open(self.media_file.path, "rb") as f:
-                    myfile = File(f)
-                    thumbnail_name = (
-                        helpers.get_file_name(self.media_file.path) + ".jpg"
-                    )
-                    self.thumbnail.save(content=myfile, name=thumbnail_name)
-                    self.poster.save(content=myfile, name=thumbnail_name)
+                    self.poster.save(content=File(f), name=thumbnail_name, save=False)
+                    f.seek(0)
+                    self.thumbnail.save(content=File(f), name=thumbnail_name)
         return True
 
     def produce_thumbnails_from_video(self):
@@ -612,25 +794,33 @@ class Media(models.Model):
     def encode(self, profiles=[], force=True, chunkize=True):
         if not profiles:
             profiles = EncodeProfile.objects.filter(active=True)
+            if self.video_height:
+                # skip resolutions higher than the video's, except the
+                # minimum ones that are always encoded
+                profiles = profiles.filter(
+                    Q(extension="gif")
+                    | Q(resolution__lte=self.video_height)
+                    | Q(resolution__in=settings.MINIMUM_RESOLUTIONS_TO_ENCODE)
+                )
         profiles = list(profiles)
 
         from . import tasks
 
         if self.duration > settings.CHUNKIZE_VIDEO_DURATION and chunkize:
+            # gif previews are not chunkized
+            gif_profiles = []
+            chunk_profiles = []
             for profile in profiles:
                 if profile.extension == "gif":
-                    profiles.remove(profile)
-                    encoding = Encoding(media=self, profile=profile)
-                    encoding.save()
-                    enc_url = settings.SSL_FRONTEND_HOST + encoding.get_absolute_url()
-                    tasks.encode_media.apply_async(
-                        args=[self.friendly_token, profile.id, encoding.id, enc_url],
-                        kwargs={"force": force},
-                        priority=0,
-                    )
-            profiles = [p.id for p in profiles]
-            tasks.chunkize_media.delay(self.friendly_token, profiles, force=force)
+                    gif_profiles.append(profile)
+                else:
+                    chunk_profiles.append(profile.id)
+            self.create_encodings(gif_profiles, force=force)
+            tasks.chunkize_media.delay(
+                self.friendly_token, chunk_profiles, force=force
+            )
         else:
+            to_encode = []
             for profile in profiles:
                 if profile.extension != "gif":
                     if self.video_height and self.video_height < profile.resolution:
@@ -639,26 +829,41 @@ class Media(models.Model):
                             in settings.MINIMUM_RESOLUTIONS_TO_ENCODE
                         ):
                             continue
-                encoding = Encoding(media=self, profile=profile)
-                encoding.save()
-                enc_url = settings.SSL_FRONTEND_HOST + encoding.get_absolute_url()
-                # priority!
-                if profile.resolution in settings.MINIMUM_RESOLUTIONS_TO_ENCODE:
-                    priority = 9
-                else:
-                    priority = 0
-                tasks.encode_media.apply_async(
-                    args=[self.friendly_token, profile.id, encoding.id, enc_url],
-                    kwargs={"force": force},
-                    priority=priority,
-                )
+                to_encode.append(profile)
+            self.create_encodings(to_encode, force=force)
 
         return True
 
+    def create_encodings(self, profiles, force=True):
+        # create the Encoding objects of all profiles with one INSERT,
+        # then send them for encoding
+        if not profiles:
+            return []
+        from . import tasks
+
+        encodings = Encoding.objects.bulk_create(
+            [Encoding(media=self, profile=profile) for profile in profiles]
+        )
+        for encoding in encodings:
+            profile = encoding.profile
+            enc_url = settings.SSL_FRONTEND_HOST + encoding.get_absolute_url()
+            # priority!
+            if profile.resolution in settings.MINIMUM_RESOLUTIONS_TO_ENCODE:
+                priority = 9
+            else:
+                priority = 0
+            tasks.encode_media.apply_async(
+                args=[self.friendly_token, profile.id, encoding.id, enc_url],
+                kwargs={"force": force},
+                priority=priority,
+            )
+        return encodings
+
     def post_encode_actions(self, encoding=None, action=None):
         # perform things after encode has run
         # (whether it has failed or succeeded)
         self.set_encoding_status()
+        update_fields = ["encoding_status"]
         # set a preview url
         if encoding:
             if self.media_type == "video" and encoding.profile.extension == "gif":
@@ -666,9 +871,9 @@ class Media(models.Model):
                     self.preview_file_path = ""
                 else:
                     self.preview_file_path = encoding.media_file.path
-                self.save(update_fields=["encoding_status", "preview_file_path"])
+                update_fields.append("preview_file_path")
 
-        self.save(update_fields=["encoding_status"])
+        self.save(update_fields=update_fields)
         if (
             encoding
             and encoding.status == "success"
@@ -686,8 +891,9 @@ class Media(models.Model):
         # set status. set success if at least 1mp4 exist
         # disregard a few encode profiles as preview
         mp4_statuses = set(
-            encoding.status
-            for encoding in self.encodings.filter(profile__extension="mp4", chunk=False)
+            self.encodings.filter(profile__extension="mp4", chunk=False)
+            .values_list("status", flat=True)
+            .distinct()
         )
 
         if not mp4_statuses:
@@ -703,16 +909,22 @@ class Media(models.Model):
 
         return True
 
+    def get_encodings_with_profile(self):
+        # fetch all encodings (chunks included) once, together with their
+        # profile. Reuse the prefetch cache if the queryset that loaded this
+        # media used prefetch_related("encodings__profile"), eg on detail views
+        if "encodings" in getattr(self, "_prefetched_objects_cache", {}):
+            return list(self.encodings.all())
+        return list(self.encodings.select_related("profile"))
+
     @property
     def encodings_info(self, full=False):
-        ret = {}
-        chunks_ret = {}
-        if self.media_type not in ["video"]:
-            return ret
-        for key in ENCODE_RESOLUTIONS_KEYS:
-            ret[key] = {}
-        for encoding in self.encodings.select_related("profile").filter(chunk=False):
-            if encoding.profile.extension == "gif":
+        if self.media_type != "video":
+            return {}
+        ret = {key: {} for key in ENCODE_RESOLUTIONS_KEYS}
+        encodings = self.get_encodings_with_profile()
+        for encoding in encodings:
+            if encoding.chunk or encoding.profile.extension == "gif":
                 continue
             enc = self.get_encoding_info(encoding, full=full)
             resolution = encoding.profile.resolution
@@ -722,19 +934,18 @@ class Media(models.Model):
         # encoded, the final encoding file won't appear until
         # they are finished. Thus, produce the info for these
         if full:
-            extra = []
-            for encoding in self.encodings.select_related("profile").filter(chunk=True):
+            chunks_progress = {}
+            for encoding in encodings:
+                if not encoding.chunk:
+                    continue
                 resolution = encoding.profile.resolution
-                if not ret[resolution].get(encoding.profile.codec):
-                    extra.append(encoding.profile.codec)
-            for codec in extra:
-                ret[resolution][codec] = {}
-                v = self.encodings.filter(chunk=True, profile__codec=codec).values(
-                    "progress"
-                )
-                ret[resolution][codec]["progress"] = (
-                    sum([p["progress"] for p in v]) / v.count()
-                )
+                codec = encoding.profile.codec
+                if not ret[resolution].get(codec):
+                    chunks_progress.setdefault((resolution, codec), []).append(
+                        encoding.progress
+                    )
+            for (resolution, codec), progress in chunks_progress.items():
+                ret[resolution][codec] = {"progress": sum(progress) / len(progress)}
                 # TODO; status/logs/errors
         return ret
 
@@ -792,7 +1003,7 @@ class Media(models.Model):
     def media_country_info(self):
         ret = []
         country = (
-            dict(lists.video_countries).get(self.media_country, None)
+            lists.video_countries_by_code.get(self.media_country, None)
             if self.media_country
             else None
         )
@@ -809,7 +1020,7 @@ class Media(models.Model):
     def media_language_info(self):
         ret = []
         media_language = (
-            dict(lists.video_languages).get(self.media_language, None)
+            lists.video_languages_by_code.get(self.media_language, None)
             if self.media_language
             else None
         )
@@ -836,7 +1047,7 @@ class Media(models.Model):
     @property
     def original_media_url(self):
         if settings.SHOW_ORIGINAL_MEDIA:
-            base_url = helpers.url_from_path(self.media_file.path)
+            base_url = helpers.url_from_file_name(self.media_file.name)
             return helpers.build_versioned_url(base_url, self.media_version)
         else:
             return None
@@ -844,20 +1055,20 @@ class Media(models.Model):
     @property
     def thumbnail_url(self):
         if self.uploaded_thumbnail:
-            base_url = helpers.url_from_path(self.uploaded_thumbnail.path)
+            base_url = helpers.url_from_file_name(self.uploaded_thumbnail.name)
             return helpers.build_versioned_url(base_url, self.media_version)
         if self.thumbnail:
-            base_url = helpers.url_from_path(self.thumbnail.path)
+            base_url = helpers.url_from_file_name(self.thumbnail.name)
             return helpers.build_versioned_url(base_url, self.media_version)
         return None
 
     @property
     def poster_url(self):
         if self.uploaded_poster:
-            base_url = helpers.url_from_path(self.uploaded_poster.path)
+            base_url = helpers.url_from_file_name(self.uploaded_poster.name)
             return helpers.build_versioned_url(base_url, self.media_version)
         if self.poster:
-            base_url = helpers.url_from_path(self.poster.path)
+            base_url = helpers.url_from_file_name(self.poster.name)
             return helpers.build_versioned_url(base_url, self.media_version)
         return None
 
@@ -878,7 +1089,7 @@ class Media(models.Model):
     @property
     def sprites_url(self):
         if self.sprites:
-            base_url = helpers.url_from_path(self.sprites.path)
+            base_url = helpers.url_from_file_name(self.sprites.name)
             return helpers.build_versioned_url(base_url, self.media_version)
         return None
 
@@ -887,41 +1098,27 @@ class Media(models.Model):
         if self.preview_file_path:
             base_url = helpers.url_from_path(self.preview_file_path)
             return helpers.build_versioned_url(base_url, self.media_version)
-        # get preview_file out of the encodings, since some times preview_file_path
-        # is empty but there is the gif encoding!
-        preview_media = self.encodings.filter(profile__extension="gif").first()
-        if preview_media and preview_media.media_file:
-            base_url = helpers.url_from_path(preview_media.media_file.path)
-            return helpers.build_versioned_url(base_url, self.media_version)
         return None
 
     @property
     def hls_info(self):
         res = {}
         if self.hls_file:
-            if os.path.exists(self.hls_file):
-                hls_file = self.hls_file
-                p = os.path.dirname(hls_file)
-                m3u8_obj = m3u8.load(hls_file)
-                if os.path.exists(hls_file):
-                    base_url = helpers.url_from_path(hls_file)
-                    res["master_file"] = helpers.build_versioned_url(base_url, self.media_version)
-                    for iframe_playlist in m3u8_obj.iframe_playlists:
-                        uri = os.path.join(p, iframe_playlist.uri)
-                        if os.path.exists(uri):
-                            resolution = iframe_playlist.iframe_stream_info.resolution[
-                                1
-                            ]
-                            base_url = helpers.url_from_path(uri)
-                            res["{}_iframe".format(resolution)] = helpers.build_versioned_url(base_url, self.media_version)
-                    for playlist in m3u8_obj.playlists:
-                        uri = os.path.join(p, playlist.uri)
-                        if os.path.exists(uri):
-                            resolution = playlist.stream_info.resolution[1]
-                            base_url = helpers.url_from_path(uri)
-                            res[
-                                "{}_playlist".format(resolution)
-                            ] = helpers.build_versioned_url(base_url, self.media_version)
+            try:
+                mtime = os.stat(self.hls_file).st_mtime_ns
+            except OSError:
+                return res
+            iframe_playlists, playlists = load_hls_playlists(self.hls_file, mtime)
+            base_url = helpers.url_from_path(self.hls_file)
+            res["master_file"] = helpers.build_versioned_url(base_url, self.media_version)
+            for resolution, uri in iframe_playlists:
+                base_url = helpers.url_from_path(uri)
+                res["{}_iframe".format(resolution)] = helpers.build_versioned_url(base_url, self.media_version)
+            for resolution, uri in playlists:
+                base_url = helpers.url_from_path(uri)
+                res[
+                    "{}_playlist".format(resolution)
+                ] = helpers.build_versioned_url(base_url, self.media_version)
         return res
 
     @property
@@ -1024,7 +1221,7 @@ class Category(models.Model):
     media_count = models.IntegerField(default=0)  # save number of videos
     thumbnail = ProcessedImageField(
         upload_to=category_thumb_path,
-        processors=[ResizeToFit(width=344, height=None)],
+        processors=[DraftResizeToFit(width=344, height=None)],
         format="JPEG",
         options={"quality": 85},
         blank=True,
@@ -1040,25 +1237,39 @@ class Category(models.Model):
         ordering = ["title"]
         verbose_name_plural = "Categories"
 
+    def __init__(self, *args, **kwargs):
+        super(Category, self).__init__(*args, **kwargs)
+        self.__original_text = self.__text_values()
+
+    def __text_values(self):
+        # as loaded or last saved, ie already stripped of html tags.
+        # Read from __dict__, not to load deferred fields
+        return {item: self.__dict__.get(item) for item in ("title", "description")}
+
     def get_absolute_url(self):
         return reverse("search") + "?c={0}".format(self.title)
 
     def update_category_media(self):
-        self.media_count = Media.objects.filter(
-            state="public", is_reviewed=True, encoding_status="success", category=self
-        ).count()
-        self.save(update_fields=["media_count"])
+        counts = Category.update_media_count([self.id])
+        self.media_count = counts.get(self.id, 0)
         return True
 
-    @property
+    @classmethod
+    def update_media_count(cls, ids):
+        return update_media_counts(cls, "category", ids, encoding_status="success")
+
+    @cached_property
     def thumbnail_url(self):
         if self.thumbnail:
             return helpers.url_from_path(self.thumbnail.path)
 
         if self.listings_thumbnail:
             return self.listings_thumbnail
+        if hasattr(self, "_fallback_thumbnail_url"):
+            return self._fallback_thumbnail_url
         media = (
             Media.objects.filter(category=self, state="public")
+            .only(*THUMBNAIL_URL_FIELDS)
             .order_by("-views")
             .first()
         )
@@ -1067,11 +1278,41 @@ class Category(models.Model):
 
         return None
 
+    @classmethod
+    def set_fallback_thumbnails(cls, categories):
+        """For categories without a thumbnail, find the thumbnail of
+        their most viewed public media with a single query, instead of
+        a query per category in thumbnail_url
+        """
+        categories = [
+            category
+            for category in categories
+            if not (category.thumbnail or category.listings_thumbnail)
+        ]
+        if not categories:
+            return categories
+        thumbnails = {
+            media.category_id: media.thumbnail_url
+            for media in Media.objects.filter(
+                category__in=categories, state="public"
+            )
+            .annotate(category_id=F("category"))
+            .only(*THUMBNAIL_URL_FIELDS)
+            .order_by("category__id", "-views")
+            .distinct("category__id")
+        }
+        for category in categories:
+            category._fallback_thumbnail_url = thumbnails.get(category.id)
+        return categories
+
     def save(self, *args, **kwargs):
         strip_text_items = ["title", "description"]
         for item in strip_text_items:
-            setattr(self, item, strip_tags(getattr(self, item, None)))
+            value = getattr(self, item, None)
+            if self._state.adding or value != self.__original_text[item]:
+                setattr(self, item, strip_tags(value))
         super(Category, self).save(*args, **kwargs)
+        self.__original_text = self.__text_values()
 
 
 class Topic(models.Model):
@@ -1083,7 +1324,7 @@ class Topic(models.Model):
     media_count = models.IntegerField(default=0)  # save number of videos
     thumbnail = ProcessedImageField(
         upload_to=topic_thumb_path,
-        processors=[ResizeToFit(width=344, height=None)],
+        processors=[DraftResizeToFit(width=344, height=None)],
         format="JPEG",
         options={"quality": 85},
         blank=True,
@@ -1109,12 +1350,14 @@ class Topic(models.Model):
         return None
 
     def update_tag_media(self):
-        self.media_count = Media.objects.filter(
-            state="public", is_reviewed=True, topics=self
-        ).count()
-        self.save(update_fields=["media_count"])
+        counts = Topic.update_media_count([self.id])
+        self.media_count = counts.get(self.id, 0)
         return True
 
+    @classmethod
+    def update_media_count(cls, ids):
+        return update_media_counts(cls, "topics", ids)
+
 
 class Tag(models.Model):
     title = models.CharField(max_length=100, unique=True, db_index=True)
@@ -1136,25 +1379,30 @@ class Tag(models.Model):
         return reverse("search") + "?t={0}".format(self.title)
 
     def update_tag_media(self):
-        self.media_count = Media.objects.filter(
-            state="public", is_reviewed=True, tags=self
-        ).count()
-        self.save(update_fields=["media_count"])
+        counts = Tag.update_media_count([self.id])
+        self.media_count = counts.get(self.id, 0)
         return True
 
+    @classmethod
+    def update_media_count(cls, ids):
+        return update_media_counts(cls, "tags", ids)
+
     def save(self, *args, **kwargs):
-        self.title = slugify(self.title[:99])
-        strip_text_items = ["title"]
-        for item in strip_text_items:
-            setattr(self, item, strip_tags(getattr(self, item, None)))
+        # slugify leaves no markup behind, so there is nothing to strip_tags
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "title" in update_fields:
+            self.title = slugify(self.title[:99])
         super(Tag, self).save(*args, **kwargs)
 
-    @property
+    @cached_property
     def thumbnail_url(self):
         if self.listings_thumbnail:
             return self.listings_thumbnail
         media = (
-            Media.objects.filter(tags=self, state="public").order_by("-views").first()
+            Media.objects.filter(tags=self, state="public")
+            .only(*THUMBNAIL_URL_FIELDS)
+            .order_by("-views")
+            .first()
         )
         if media:
             return media.thumbnail_url
@@ -1187,16 +1435,19 @@ class MediaLanguage(models.Model):
         return None
 
     def update_language_media(self):
-        language = {
-            value: key for key, value in dict(lists.video_languages).items()
-        }.get(self.title)
+        language = lists.video_languages_by_title.get(self.title)
         if language:
-            self.media_count = Media.objects.filter(
-                state="public", is_reviewed=True, media_language=language
-            ).count()
-        self.save(update_fields=["media_count"])
+            MediaLanguage.update_media_count(language)
+            self.refresh_from_db(fields=["media_count"])
         return True
 
+    @classmethod
+    def update_media_count(cls, code):
+        title = lists.video_languages_by_code.get(code)
+        if not title:
+            return False
+        return update_code_media_count(cls, "media_language", code, title)
+
 
 class MediaCountry(models.Model):
     # TODO: to replace lists.media_country!
@@ -1223,16 +1474,19 @@ class MediaCountry(models.Model):
         return None
 
     def update_country_media(self):
-        country = {
-            value: key for key, value in dict(lists.video_countries).items()
-        }.get(self.title)
+        country = lists.video_countries_by_title.get(self.title)
         if country:
-            self.media_count = Media.objects.filter(
-                state="public", is_reviewed=True, media_country=country
-            ).count()
-        self.save(update_fields=["media_count"])
+            MediaCountry.update_media_count(country)
+            self.refresh_from_db(fields=["media_count"])
         return True
 
+    @classmethod
+    def update_media_count(cls, code):
+        title = lists.video_countries_by_code.get(code)
+        if not title:
+            return False
+        return update_code_media_count(cls, "media_country", code, title)
+
 
 class EncodeProfile(models.Model):
     "Encode Profiles"
@@ -1290,21 +1544,41 @@ class Encoding(models.Model):
             return helpers.build_versioned_url(base_url, self.media.media_version)
         return None
 
+    def __init__(self, *args, **kwargs):
+        super(Encoding, self).__init__(*args, **kwargs)
+        self._keep_original_values()
+
+    def _keep_original_values(self):
+        # status/media_file as loaded or last saved, see encoding_file_save.
+        # Read from __dict__, not to load deferred fields
+        self._original_status = self.__dict__.get("status")
+        media_file = self.__dict__.get("media_file")
+        self._original_media_file = getattr(media_file, "name", media_file)
+
     def save(self, *args, **kwargs):
-        if self.media_file:
-            cmd = ["stat", "-c", "%s", self.media_file.path]
-            stdout = helpers.run_command(cmd).get("out")
-            if stdout:
-                size = int(stdout.strip())
+        # saves limited to other fields, eg the progress/status updates
+        # while encoding, don't need to stat or hash the files
+        update_fields = kwargs.get("update_fields")
+        stat_file = update_fields is None or bool(
+            {"media_file", "size"}.intersection(update_fields)
+        )
+        hash_file = update_fields is None or bool(
+            {"chunk_file_path", "md5sum"}.intersection(update_fields)
+        )
+        if stat_file and self.media_file:
+            try:
+                size = os.path.getsize(self.media_file.path)
+            except OSError:
+                size = None
+            if size:
                 self.size = helpers.show_file_size(size)
-        if self.chunk_file_path and not self.md5sum:
-            cmd = ["md5sum", self.chunk_file_path]
-            stdout = helpers.run_command(cmd).get("out")
-            if stdout:
-                md5sum = stdout.strip().split()[0]
+        if hash_file and self.chunk_file_path and not self.md5sum:
+            md5sum = helpers.file_md5sum(self.chunk_file_path)
+            if md5sum:
                 self.md5sum = md5sum
 
         super(Encoding, self).save(*args, **kwargs)
+        self._keep_original_values()
 
     def set_progress(self, progress, commit=True):
         if isinstance(progress, int):
@@ -1463,6 +1737,21 @@ class Rating(models.Model):
         )
 
 
+class PlaylistQuerySet(models.QuerySet):
+    def for_listing(self):
+        # load the user and the first media of every playlist, that
+        # thumbnail_url needs, in two queries instead of two per playlist
+        first_media = (
+            PlaylistMedia.objects.select_related("media")
+            .only("playlist", *("media__" + field for field in THUMBNAIL_URL_FIELDS))
+        )[:1]
+        return self.select_related("user").prefetch_related(
+            models.Prefetch(
+                "playlistmedia_set", queryset=first_media, to_attr="first_media"
+            )
+        )
+
+
 class Playlist(models.Model):
     uid = models.UUIDField(unique=True, default=uuid.uuid4)
     title = models.CharField(max_length=90, db_index=True)
@@ -1472,15 +1761,17 @@ class Playlist(models.Model):
     )
     add_date = models.DateTimeField(auto_now_add=True, db_index=True)
     media = models.ManyToManyField(Media, through="playlistmedia", blank=True)
-    friendly_token = models.CharField(blank=True, max_length=12)
+    friendly_token = models.CharField(
+        blank=True, max_length=12, db_index=True, unique=True
+    )
+    # save number of media, kept up to date by the PlaylistMedia signals
+    media_count = models.IntegerField(default=0)
+
+    objects = PlaylistQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
-    @property
-    def media_count(self):
-        return self.media.count()
-
     def get_absolute_url(self, api=False):
         if api:
             return reverse(
@@ -1505,8 +1796,7 @@ class Playlist(models.Model):
         return None
 
     def set_ordering(self, media, ordering):
-        if not media in self.media.all():
-            return False
+        # no PlaylistMedia means that media is not in the playlist
         pm = PlaylistMedia.objects.filter(playlist=self, media=media).first()
         if pm and isinstance(ordering, int) and 0 < ordering:
             pm.ordering = ordering
@@ -1519,17 +1809,47 @@ class Playlist(models.Model):
         #       for item in strip_text_items:
         #          setattr(self, item, strip_tags(getattr(self, item, None)))
         #     self.title = slugify(self.title[:89])
+        token_generated = False
         if not self.friendly_token:
-            while True:
-                friendly_token = helpers.produce_friendly_token()
-                if not Playlist.objects.filter(friendly_token=friendly_token):
-                    self.friendly_token = friendly_token
-                    break
-        super(Playlist, self).save(*args, **kwargs)
+            # uniqueness is enforced by the db, see the retry below
+            self.friendly_token = helpers.produce_friendly_token()
+            token_generated = True
+        if not self._state.adding and not args and kwargs.get("update_fields") is None:
+            # media_count is only changed with F() updates by the
+            # PlaylistMedia signals, don't write back the in-memory value.
+            # Deferred fields are left out too, as Django does
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name != "media_count"
+                and field.attname not in deferred
+            ]
+            try:
+                super(Playlist, self).save(*args, **kwargs)
+                return
+            except DatabaseError as e:
+                # raised by Django, not by the db, when there is no row to
+                # update. Insert it, as a save without update_fields does
+                if e.__cause__ is not None:
+                    raise
+                if connection.in_atomic_block:
+                    # the transaction is fine, nothing was sent to the db
+                    transaction.set_rollback(False)
+                del kwargs["update_fields"]
+        save_with_friendly_token(
+            self,
+            lambda: super(Playlist, self).save(*args, **kwargs),
+            token_generated,
+        )
 
-    @property
+    @cached_property
     def thumbnail_url(self):
-        pm = self.playlistmedia_set.first()
+        if hasattr(self, "first_media"):
+            pm = self.first_media[0] if self.first_media else None
+        else:
+            pm = self.playlistmedia_set.select_related("media").first()
         if pm:
             # return helpers.url_from_path(pm.media.thumbnail.path)
             return pm.media.thumbnail_url
@@ -1563,17 +1883,25 @@ class Comment(MPTTModel):
     class MPTTMeta:
         order_insertion_by = ["add_date"]
 
+    def __init__(self, *args, **kwargs):
+        super(Comment, self).__init__(*args, **kwargs)
+        # text as loaded or last saved, already stripped of html tags
+        self.__original_text = self.__dict__.get("text")
+
     def __str__(self):
         return "On {0} by {1}".format(self.media.title, self.user.username)
 
     def save(self, *args, **kwargs):
-        strip_text_items = ["text"]
-        for item in strip_text_items:
-            setattr(self, item, strip_tags(getattr(self, item, None)))
+        if self._state.adding or self.text != self.__original_text:
+            self.text = strip_tags(self.text)
         if self.text:
             self.text = self.text[: settings.MAX_CHARS_FOR_COMMENT]
+        adding = self._state.adding
         super(Comment, self).save(*args, **kwargs)
-        if settings.UNLISTED_WORKFLOW_MAKE_PUBLIC_UPON_COMMENTARY_ADD:
+        self.__original_text = self.text
+        # only a new comment can make the media public, edits of
+        # existing comments don't need to load the media at all
+        if adding and settings.UNLISTED_WORKFLOW_MAKE_PUBLIC_UPON_COMMENTARY_ADD:
             if self.media.state == "unlisted":
                 self.media.state = "public"
                 self.media.save(update_fields=["state"])
@@ -1703,6 +2031,47 @@ class TinyMCEMedia(models.Model):
         return self.file.url
 
 
+def update_media_counts(model, lookup, ids, **filters):
+    """Set media_count on many Category/Tag/Topic objects at once,
+    with a grouped COUNT query and a single bulk UPDATE instead of a
+    COUNT and a save() per object.
+    lookup is the Media relation to the model, eg "category".
+    Returns the counts by id
+    """
+    ids = list(ids)
+    if not ids:
+        return {}
+    counts = dict(
+        Media.objects.filter(
+            state="public", is_reviewed=True, **{f"{lookup}__in": ids}, **filters
+        )
+        .order_by()
+        .values_list(lookup)
+        .annotate(count=Count("id"))
+    )
+    model.objects.bulk_update(
+        [model(id=id, media_count=counts.get(id, 0)) for id in ids], ["media_count"]
+    )
+    return counts
+
+
+def update_code_media_count(model, lookup, code, title):
+    """Set media_count on the MediaLanguage/MediaCountry with this title,
+    with a single UPDATE that counts the media in a subquery.
+    lookup is the Media field of the code, eg "media_country"
+    """
+    count = (
+        Media.objects.filter(state="public", is_reviewed=True, **{lookup: code})
+        .order_by()
+        .values(lookup)
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    return model.objects.filter(title=title).update(
+        media_count=Coalesce(Subquery(count), 0)
+    )
+
+
 @receiver(post_save, sender=Media)
 def media_save(sender, instance, created, **kwargs):
     # media_file path is not set correctly until mode is saved
@@ -1714,51 +2083,55 @@ def media_save(sender, instance, created, **kwargs):
     if created:
         instance.media_init()
         notify_users(friendly_token=instance.friendly_token, action="media_added")
-    instance.user.update_user_media()
-    if instance.category.all():
+    update_fields = kwargs.get("update_fields")
+    if created or not update_fields or "user" in update_fields:
+        instance.user.update_user_media()
+
+    if not update_fields or set(MEDIA_COUNT_FIELDS).intersection(update_fields):
         # this won't catch when a category
         # is removed from a media, which is what we want...
-        for category in instance.category.all():
-            category.update_category_media()
-    if instance.tags.all():
-        for tag in instance.tags.all():
-            tag.update_tag_media()
-    if instance.topics.all():
-        for topic in instance.topics.all():
-            topic.update_tag_media()
-
-    if instance.media_country:
-        country = {
-            key: value for key, value in dict(lists.video_countries).items()
-        }.get(instance.media_country)
-        if country:
-            country = MediaCountry.objects.filter(title=country).first()
-        if country:
-            country.update_country_media()
+        Category.update_media_count(instance.category.values_list("id", flat=True))
+        Tag.update_media_count(instance.tags.values_list("id", flat=True))
+        Topic.update_media_count(instance.topics.values_list("id", flat=True))
 
-    if instance.media_language:
-        language = {
-            key: value for key, value in dict(lists.video_languages).items()
-        }.get(instance.media_language)
-        if language:
-            language = MediaLanguage.objects.filter(title=language).first()
-        if language:
-            language.update_language_media()
+        if instance.media_country:
+            MediaCountry.update_media_count(instance.media_country)
+        if instance.media_language:
+            MediaLanguage.update_media_count(instance.media_language)
 
-    instance.update_search_vector()
+    if not update_fields or set(SEARCH_VECTOR_FIELDS).intersection(update_fields):
+        instance.update_search_vector()
     instance.transcribe_function()
 
 
+def remove_files_on_commit(media_files, directories=None, origin=None):
+    """Remove files in a remove_media_files task once the delete that
+    drops them is committed. Files of the same delete() call (the origin
+    of the post_delete signals, eg a media and its encodings, or an admin
+    bulk delete) are batched in a single task
+    """
+    from . import tasks
+
+    pending = getattr(origin, "_files_to_remove", None)
+    first = pending is None
+    if first:
+        pending = {"media_files": [], "directories": []}
+    pending["media_files"].extend(media_files)
+    pending["directories"].extend(directories or [])
+    if first:
+        # outside a transaction the task is sent at once, nothing to batch
+        if origin is not None and connection.in_atomic_block:
+            origin._files_to_remove = pending
+        transaction.on_commit(lambda: tasks.remove_media_files.delay(**pending))
+
+
 @receiver(pre_delete, sender=Media)
 def media_file_pre_delete(sender, instance, **kwargs):
-    if instance.category.all():
-        for category in instance.category.all():
-            instance.category.remove(category)
-            category.update_category_media()
-    if instance.tags.all():
-        for tag in instance.tags.all():
-            instance.tags.remove(tag)
-            tag.update_tag_media()
+    # detach the media first, so that it is not counted any more.
+    # The counts are updated by the media_m2m handler on clear
+    instance.category.clear()
+    instance.tags.clear()
+    instance.topics.clear()
 
 
 @receiver(post_delete, sender=Media)
@@ -1767,36 +2140,53 @@ def media_file_delete(sender, instance, **kwargs):
     Deletes file from filesystem
     when corresponding `Media` object is deleted.
     """
-    if instance.media_file:
-        helpers.rm_file(instance.media_file.path)
-    if instance.thumbnail:
-        helpers.rm_file(instance.thumbnail.path)
-    if instance.uploaded_thumbnail:
-        helpers.rm_file(instance.uploaded_thumbnail.path)
-    if instance.uploaded_poster:
-        helpers.rm_file(instance.uploaded_poster.path)
-    if instance.uploaded_thumbnail:
-        helpers.rm_file(instance.uploaded_thumbnail.path)
-    if instance.uploaded_poster:
-        helpers.rm_file(instance.uploaded_poster.path)
-    if instance.poster:
-        helpers.rm_file(instance.poster.path)
-    if instance.sprites:
-        helpers.rm_file(instance.sprites.path)
+    # remove the files in a task, once the delete is committed, so that
+    # deletes (eg bulk deletes from the admin) don't wait on the filesystem
+    media_files = [
+        field.path
+        for field in (
+            instance.media_file,
+            instance.thumbnail,
+            instance.uploaded_thumbnail,
+            instance.uploaded_poster,
+            instance.poster,
+            instance.sprites,
+        )
+        if field
+    ]
+    directories = []
     if instance.hls_file:
-        p = os.path.dirname(instance.hls_file)
-        helpers.rm_dir(p)
+        directories.append(os.path.dirname(instance.hls_file))
+    if media_files or directories:
+        remove_files_on_commit(media_files, directories, origin=kwargs.get("origin"))
     instance.user.update_user_media()
 
 
 @receiver(m2m_changed, sender=Media.category.through)
-def media_m2m(sender, instance, **kwargs):
-    if instance.category.all():
-        for category in instance.category.all():
-            category.update_category_media()
-    if instance.tags.all():
-        for tag in instance.tags.all():
-            tag.update_tag_media()
+@receiver(m2m_changed, sender=Media.tags.through)
+@receiver(m2m_changed, sender=Media.topics.through)
+def media_m2m(sender, instance, action, reverse, model, pk_set, **kwargs):
+    # only the categories/tags/topics that got media added/removed
+    # need a new count
+    if reverse:
+        # instance is a Category/Tag/Topic, pk_set are Media ids
+        if action in ("post_add", "post_remove", "post_clear"):
+            instance.update_media_count([instance.id])
+        return
+    if action == "pre_clear":
+        # pk_set is None on clear, keep the ids that get cleared
+        instance._cleared_m2m_ids = list(
+            model.objects.filter(media=instance).values_list("id", flat=True)
+        )
+    elif action == "post_clear":
+        model.update_media_count(getattr(instance, "_cleared_m2m_ids", []))
+        instance._cleared_m2m_ids = []
+    elif action in ("post_add", "post_remove"):
+        model.update_media_count(pk_set or [])
+    if model is Tag and action in ("post_add", "post_remove", "post_clear"):
+        # tag titles are part of the search vector, and tags are edited
+        # after the media is saved, see SEARCH_VECTOR_FIELDS
+        instance.update_search_vector()
 
 
 @receiver(post_save, sender=Encoding)
@@ -1813,28 +2203,28 @@ def encoding_file_save(sender, instance, created, **kwargs):
                 instance.delete()
                 return False
 
-            chunks = Encoding.objects.filter(
-                media=instance.media,
-                profile=instance.profile,
+            chunks_qs = Encoding.objects.filter(
+                media_id=instance.media_id,
+                profile_id=instance.profile_id,
                 chunks_info=instance.chunks_info,
                 chunk=True,
             ).order_by("add_date")
+            # logs, workers and dates are aggregated by the db below
+            chunks = list(chunks_qs.values_list("chunk_file_path", "media_file"))
 
-            complete = True
             # perform validation, make sure everything is there
-            for chunk in orig_chunks:
-                if not chunks.filter(chunk_file_path=chunk):
-                    complete = False
-                    break
-
-            for chunk in chunks:
-                if not (chunk.media_file and chunk.media_file.path):
-                    complete = False
-                    break
+            complete = set(orig_chunks).issubset(
+                chunk_file_path for chunk_file_path, media_file in chunks
+            )
+            if complete:
+                complete = all(media_file for chunk_file_path, media_file in chunks)
 
             if complete:
                 # this should run only once!
-                chunks_paths = [f.media_file.path for f in chunks]
+                storage = instance.media_file.storage
+                chunks_paths = [
+                    storage.path(media_file) for chunk_file_path, media_file in chunks
+                ]
 
                 with tempfile.TemporaryDirectory(
                     dir=settings.TEMP_DIRECTORY
@@ -1871,25 +2261,33 @@ def encoding_file_save(sender, instance, created, **kwargs):
                         status="success",
                         progress=100,
                     )
-                    all_logs = "\n".join([st.logs for st in chunks])
+                    summary = chunks_qs.aggregate(
+                        start_date=Min("add_date"),
+                        end_date=Max("update_date"),
+                        logs=StringAgg("logs", delimiter="\n", order_by="add_date"),
+                        workers=ArrayAgg("worker", distinct=True),
+                    )
                     encoding.logs = "{0}\n{1}\n{2}".format(
-                        chunks_paths, stdout, all_logs
+                        chunks_paths, stdout, summary["logs"]
                     )
-                    workers = list(set([st.worker for st in chunks]))
+                    workers = summary["workers"]
                     encoding.worker = json.dumps({"workers": workers})
-
-                    start_date = min([st.add_date for st in chunks])
-                    end_date = max([st.update_date for st in chunks])
-                    encoding.total_run_time = (end_date - start_date).seconds
-                    encoding.save()
+                    encoding.total_run_time = (
+                        summary["end_date"] - summary["start_date"]
+                    ).seconds
 
                     with open(tf, "rb") as f:
-                        myfile = File(f)
+                        myfile = TemporaryFile(f)
                         output_name = "{0}.{1}".format(
                             helpers.get_file_name(instance.media.media_file.path),
                             instance.profile.extension,
                         )
-                        encoding.media_file.save(content=myfile, name=output_name)
+                        encoding.media_file.save(
+                            content=myfile, name=output_name, save=False
+                        )
+                    # a single insert, with the file in place, so that the
+                    # post_save actions run once and see the final encoding
+                    encoding.save()
 
                     # encoding is saved, deleting chunks
                     # and any other encoding that might exist
@@ -1898,50 +2296,44 @@ def encoding_file_save(sender, instance, created, **kwargs):
                     if (
                         len(orig_chunks)
                         == Encoding.objects.filter(
-                            media=instance.media,
-                            profile=instance.profile,
+                            media_id=instance.media_id,
+                            profile_id=instance.profile_id,
                             chunks_info=instance.chunks_info,
                         ).count()
                     ):
                         # if two chunks are finished at the same time, this will be changed
                         who = Encoding.objects.filter(
-                            media=encoding.media, profile=encoding.profile
+                            media_id=encoding.media_id, profile_id=encoding.profile_id
                         ).exclude(id=encoding.id)
+                        deleted, _ = who.only(*ENCODING_DELETE_FIELDS).delete()
                         print(
-                            "{0} Deleting".format(encoding.media.friendly_token),
-                            [enco.id for enco in who],
+                            "{0} Deleted".format(encoding.media.friendly_token),
+                            deleted,
                             encoding.id,
                         )
-                        who.delete()
                     else:
-                        print(
-                            "Deleting myself",
-                            chunks,
-                            Encoding.objects.filter(
-                                media=instance.media,
-                                profile=instance.profile,
-                                chunk=True,
-                            ),
-                            encoding.id,
-                        )
+                        print("Deleting myself", chunks_paths, encoding.id)
                         encoding.delete()
-                    if not Encoding.objects.filter(chunks_info=instance.chunks_info):
+                    if not Encoding.objects.filter(
+                        chunks_info=instance.chunks_info
+                    ).exists():
                         print("these workers have worked in total: %s" % workers)
                         # TODO: send to specific worker to delete file
                         # for worker in workers:
                         #    for chunk in json.loads(instance.chunks_info).keys():
                         #        remove_media_file.delay(media_file=chunk)
-                        for chunk in json.loads(instance.chunks_info).keys():
+                        for chunk in orig_chunks:
                             print("deleting chunk: %s" % chunk)
                             helpers.rm_file(chunk)
-                    instance.media.post_encode_actions(encoding=instance, action="add")
+                    # no post_encode_actions for the chunk here, saving the
+                    # concatenated encoding above has already run them
 
     elif instance.chunk and instance.status == "fail":
         encoding = Encoding(
             media=instance.media, profile=instance.profile, status="fail", progress=100
         )
         chunks = Encoding.objects.filter(
-            media=instance.media, chunks_info=instance.chunks_info, chunk=True
+            media_id=instance.media_id, chunks_info=instance.chunks_info, chunk=True
         ).order_by("add_date")
         chunks_paths = [f.media_file.path for f in chunks]
 
@@ -1955,36 +2347,27 @@ def encoding_file_save(sender, instance, created, **kwargs):
         encoding.save()
 
         who = Encoding.objects.filter(
-            media=encoding.media, profile=encoding.profile
+            media_id=encoding.media_id, profile_id=encoding.profile_id
         ).exclude(id=encoding.id)
+        deleted, _ = who.only(*ENCODING_DELETE_FIELDS).delete()
         print(
-            "{0} deleting failed chunk".format(encoding.media.friendly_token),
-            [enco.id for enco in who],
+            "{0} deleted failed chunks".format(encoding.media.friendly_token),
+            deleted,
             encoding.id,
         )
-        who.delete()
         pass  # TODO: merge with above if, do not repeat code
     else:
+        # only on a transition to fail/success or a new file (remote
+        # workers upload it after reporting the status), not on every save
+        if (
+            not created
+            and instance.status == instance._original_status
+            and instance.media_file.name == instance._original_media_file
+        ):
+            return
         if instance.status in ["fail", "success"]:
             instance.media.post_encode_actions(encoding=instance, action="add")
 
-        encodings = set(
-            [
-                encoding.status
-                for encoding in Encoding.objects.filter(media=instance.media)
-            ]
-        )
-        if ("running" in encodings) or ("pending" in encodings):
-            return
-        workers = list(
-            set(
-                [
-                    encoding.worker
-                    for encoding in Encoding.objects.filter(media=instance.media)
-                ]
-            )
-        )
-
 
 # TODO: send to specific worker
 # for worker in workers:
@@ -1999,8 +2382,17 @@ def encoding_file_delete(sender, instance, **kwargs):
     when corresponding `Encoding` object is deleted.
     """
     if instance.media_file:
-        helpers.rm_file(instance.media_file.path)
-        if not instance.chunk:
+        # remove the file once the delete is committed, outside of the
+        # transaction (and the request) that deletes the encoding(s),
+        # in one task with the other files of the same delete
+        origin = kwargs.get("origin")
+        remove_files_on_commit([instance.media_file.path], origin=origin)
+        # when the encodings go because their media is deleted, there
+        # is no media left to update, skip a save per encoding
+        media_deleted = isinstance(origin, Media) or (
+            isinstance(origin, models.QuerySet) and origin.model is Media
+        )
+        if not instance.chunk and not media_deleted:
             instance.media.post_encode_actions(encoding=instance, action="delete")
     # delete local chunks, and remote chunks + media file. Only when the
     # last encoding of a media is complete
@@ -2008,12 +2400,35 @@ def encoding_file_delete(sender, instance, **kwargs):
 
 @receiver(post_delete, sender=Comment)
 def comment_delete(sender, instance, **kwargs):
-    if instance.media.state == "public":
-        if settings.UNLISTED_WORKFLOW_MAKE_PRIVATE_UPON_COMMENTARY_DELETE:
-            if instance.media.comments.exclude(uid=instance.uid).count() == 0:
-                instance.media.state = "unlisted"
-                instance.media.save(update_fields=["state"])
-                # Cache invalidation will be handled by Media.save() method
+    if settings.UNLISTED_WORKFLOW_MAKE_PRIVATE_UPON_COMMENTARY_DELETE:
+        # a public media with no other comments, in a single query
+        other_comments = Comment.objects.filter(media=OuterRef("pk")).exclude(
+            uid=instance.uid
+        )
+        media = (
+            Media.objects.filter(id=instance.media_id, state="public")
+            .exclude(Exists(other_comments))
+            .first()
+        )
+        if media:
+            media.state = "unlisted"
+            media.save(update_fields=["state"])
+            # Cache invalidation will be handled by Media.save() method
+
+
+@receiver(post_save, sender=PlaylistMedia)
+def playlist_media_save(sender, instance, created, **kwargs):
+    if created:
+        Playlist.objects.filter(id=instance.playlist_id).update(
+            media_count=F("media_count") + 1
+        )
+
+
+@receiver(post_delete, sender=PlaylistMedia)
+def playlist_media_delete(sender, instance, **kwargs):
+    Playlist.objects.filter(id=instance.playlist_id).update(
+        media_count=F("media_count") - 1
+    )
 
 
 @receiver(pre_save, sender=Media)
@@ -247,7 +247,7 @@ class PlaylistSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Playlist
-        read_only_fields = ("add_date", "user")
+        read_only_fields = ("add_date", "user", "media_count")
         fields = (
             "add_date",
             "title",
@@ -265,7 +265,7 @@ class PlaylistDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Playlist
-        read_only_fields = ("add_date", "user")
+        read_only_fields = ("add_date", "user", "media_count")
         fields = (
             "title",
             "add_date",
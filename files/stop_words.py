@@ -84,3 +84,6 @@ STOP_WORDS.update(contractions)
 for apostrophe in ["‘", "’"]:
     for stopword in contractions:
         STOP_WORDS.add(stopword.replace("'", apostrophe))
+
+# read-only from here on
+STOP_WORDS = frozenset(STOP_WORDS)
@@ -34,7 +34,9 @@ from .helpers import (
     media_file_info,
     produce_ffmpeg_commands,
     produce_friendly_token,
+    rm_dir,
     rm_file,
+    rm_files,
     run_command,
 )
 from .methods import list_tasks, notify_users, pre_save_action
@@ -213,11 +215,11 @@ def encode_media(
         # it will always run since chunk_file_path is always different
         # thus find a better way for this check
         if (
-            Encoding.objects.filter(
+            force == False
+            and Encoding.objects.filter(
                 media=media, profile=profile, chunk_file_path=chunk_file_path
-            ).count()
+            )[:2].count()
             > 1
-            and force == False
         ):
             Encoding.objects.filter(id=encoding_id).delete()
             return False
@@ -241,8 +243,8 @@ def encode_media(
                 )
     else:
         if (
-            Encoding.objects.filter(media=media, profile=profile).count() > 1
-            and force is False
+            force is False
+            and Encoding.objects.filter(media=media, profile=profile)[:2].count() > 1
         ):
             Encoding.objects.filter(id=encoding_id).delete()
             return False
@@ -642,6 +644,30 @@ def produce_sprite_from_video(friendly_token):
     return True
 
 
+@task(name="produce_thumbnail_from_uploaded_poster", queue="short_tasks")
+def produce_thumbnail_from_uploaded_poster(friendly_token):
+    """Produces the uploaded_thumbnail of a media out of its uploaded_poster.
+    The original upload is not kept, ProcessedImageField stores only the
+    720px JPEG, so the thumbnail is compressed a second time. At 344px,
+    about half the poster width, the downscale hides that second pass
+    """
+
+    try:
+        media = Media.objects.get(friendly_token=friendly_token)
+    except BaseException:
+        logger.info("failed to get media with friendly_token %s" % friendly_token)
+        return False
+    if not media.uploaded_poster:
+        return False
+
+    with open(media.uploaded_poster.path, "rb") as f:
+        myfile = File(f)
+        thumbnail_name = get_file_name(media.uploaded_poster.path)
+        media.uploaded_thumbnail.save(content=myfile, name=thumbnail_name, save=False)
+    media.save(update_fields=["uploaded_thumbnail"])
+    return True
+
+
 @task(name="create_hls", queue="long_tasks")
 def create_hls(friendly_token):
     if not hasattr(settings, "MP4HLS_COMMAND"):
@@ -1115,6 +1141,15 @@ def remove_media_file(media_file=None):
     return True
 
 
+@task(name="remove_media_files", queue="short_tasks")
+def remove_media_files(media_files=None, directories=None):
+    """Remove the files (and dirs, eg HLS) of a deleted media"""
+    rm_files(media_files or [])
+    for directory in directories or []:
+        rm_dir(directory)
+    return True
+
+
 # TODO LIST
 # 1 chunks are deleted from original server when file is fully encoded.
 # however need to enter this logic in cases of fail as well
@@ -0,0 +1,482 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.postgres.search import SearchQuery
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+
+from files import helpers
+from files.models import (
+    Category,
+    Comment,
+    EncodeProfile,
+    Encoding,
+    Media,
+    Playlist,
+    PlaylistMedia,
+    Tag,
+    Topic,
+)
+from files.serializers import PlaylistDetailSerializer
+from users.models import User
+
+
+def create_media(user, **kwargs):
+    """Create a public, reviewed media without running media_init"""
+    with patch.object(Media, "media_init"), patch.object(
+        Media, "transcribe_function"
+    ), patch("files.models.notify_users"):
+        media = Media.objects.create(
+            user=user, title="test media", media_file="original/test.mp4", **kwargs
+        )
+    Media.objects.filter(id=media.id).update(
+        state="public", is_reviewed=True, encoding_status="success"
+    )
+    return media
+
+
+class PlaylistMediaCountTestCase(TestCase):
+    """Playlist.media_count is kept up to date by the PlaylistMedia signals"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.playlist = Playlist.objects.create(title="playlist", user=self.user)
+        self.media = create_media(self.user)
+        self.other_media = create_media(self.user)
+
+    def media_count(self):
+        return Playlist.objects.get(id=self.playlist.id).media_count
+
+    def test_add_and_remove_media(self):
+        PlaylistMedia.objects.create(playlist=self.playlist, media=self.media)
+        PlaylistMedia.objects.create(playlist=self.playlist, media=self.other_media)
+        self.assertEqual(self.media_count(), 2)
+
+        PlaylistMedia.objects.filter(playlist=self.playlist, media=self.media).delete()
+        self.assertEqual(self.media_count(), 1)
+
+    def test_media_delete(self):
+        PlaylistMedia.objects.create(playlist=self.playlist, media=self.media)
+        PlaylistMedia.objects.create(playlist=self.playlist, media=self.other_media)
+
+        self.media.delete()
+        self.assertEqual(self.media_count(), 1)
+
+    def test_save_keeps_media_count(self):
+        # self.playlist still has the media_count it was created with
+        PlaylistMedia.objects.create(playlist=self.playlist, media=self.media)
+        self.playlist.title = "renamed"
+        self.playlist.save()
+        self.assertEqual(self.media_count(), 1)
+        self.assertEqual(Playlist.objects.get(id=self.playlist.id).title, "renamed")
+
+    def test_serializer_save_keeps_media_count(self):
+        PlaylistMedia.objects.create(playlist=self.playlist, media=self.media)
+        serializer = PlaylistDetailSerializer(
+            self.playlist, data={"title": "renamed"}, partial=True
+        )
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+        self.assertEqual(self.media_count(), 1)
+
+    def test_save_update_fields(self):
+        PlaylistMedia.objects.create(playlist=self.playlist, media=self.media)
+        self.playlist.media_count = 5
+        self.playlist.save(update_fields=["media_count"])
+        self.assertEqual(self.media_count(), 5)
+
+    def test_save_deferred(self):
+        playlist = Playlist.objects.only("id", "title").get(id=self.playlist.id)
+        playlist.title = "renamed"
+        with self.assertNumQueries(1):
+            playlist.save()
+
+    def test_save_deleted(self):
+        Playlist.objects.filter(id=self.playlist.id).delete()
+        self.playlist.save()
+        self.assertTrue(Playlist.objects.filter(id=self.playlist.id).exists())
+
+
+class MediaM2MCountTestCase(TestCase):
+    """Category/Tag/Topic media_count follow the media added/removed/cleared"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.media = create_media(self.user)
+        self.category = Category.objects.create(title="category")
+        self.other_category = Category.objects.create(title="other category")
+        self.tag = Tag.objects.create(title="tag")
+
+    def media_count(self, obj):
+        return type(obj).objects.get(id=obj.id).media_count
+
+    def test_add_and_remove(self):
+        self.media.category.add(self.category, self.other_category)
+        self.media.tags.add(self.tag)
+        self.assertEqual(self.media_count(self.category), 1)
+        self.assertEqual(self.media_count(self.other_category), 1)
+        self.assertEqual(self.media_count(self.tag), 1)
+
+        self.media.category.remove(self.category)
+        self.assertEqual(self.media_count(self.category), 0)
+        self.assertEqual(self.media_count(self.other_category), 1)
+
+    def test_clear(self):
+        self.media.category.add(self.category, self.other_category)
+        self.media.tags.add(self.tag)
+
+        self.media.category.clear()
+        self.media.tags.clear()
+        self.assertEqual(self.media_count(self.category), 0)
+        self.assertEqual(self.media_count(self.other_category), 0)
+        self.assertEqual(self.media_count(self.tag), 0)
+
+    def test_reverse(self):
+        self.category.media_set.add(self.media)
+        self.assertEqual(self.media_count(self.category), 1)
+
+        self.category.media_set.clear()
+        self.assertEqual(self.media_count(self.category), 0)
+
+    def test_topics(self):
+        topic = Topic.objects.create(title="topic")
+        self.media.topics.add(topic)
+        self.assertEqual(self.media_count(topic), 1)
+
+        self.media.topics.remove(topic)
+        self.assertEqual(self.media_count(topic), 0)
+
+        self.media.topics.add(topic)
+        self.media.topics.clear()
+        self.assertEqual(self.media_count(topic), 0)
+
+    def test_media_delete(self):
+        topic = Topic.objects.create(title="topic")
+        self.media.category.add(self.category)
+        self.media.topics.add(topic)
+
+        self.media.delete()
+        self.assertEqual(self.media_count(self.category), 0)
+        self.assertEqual(self.media_count(topic), 0)
+
+
+class FriendlyTokenTestCase(TestCase):
+    """A new object retries its insert when its friendly_token is taken"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+
+    def test_playlist_token_collision(self):
+        playlist = Playlist.objects.create(title="playlist", user=self.user)
+        with patch.object(
+            helpers,
+            "produce_friendly_token",
+            side_effect=[playlist.friendly_token, "newtoken"],
+        ):
+            other = Playlist.objects.create(title="other", user=self.user)
+        self.assertEqual(other.friendly_token, "newtoken")
+        self.assertEqual(Playlist.objects.count(), 2)
+
+    def test_media_token_collision(self):
+        media = create_media(self.user)
+        with patch.object(
+            helpers,
+            "produce_friendly_token",
+            side_effect=[media.friendly_token, "newtoken"],
+        ):
+            other = create_media(self.user)
+        self.assertEqual(other.friendly_token, "newtoken")
+
+    def test_given_token_collision(self):
+        playlist = Playlist.objects.create(title="playlist", user=self.user)
+        with self.assertRaises(IntegrityError):
+            Playlist.objects.create(
+                title="other", user=self.user, friendly_token=playlist.friendly_token
+            )
+
+
+class EncodingStatusTestCase(TestCase):
+    """post_encode_actions runs when an encoding status or file changes"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.media = create_media(self.user)
+        self.profile = EncodeProfile.objects.create(name="h264-480", extension="mp4")
+        self.encoding = Encoding.objects.create(
+            media=self.media, profile=self.profile, status="running"
+        )
+
+    def test_status_change(self):
+        with patch.object(Media, "post_encode_actions") as post_encode_actions:
+            self.encoding.status = "success"
+            self.encoding.save(update_fields=["status"])
+            self.assertEqual(post_encode_actions.call_count, 1)
+
+            self.encoding.progress = 100
+            self.encoding.save(update_fields=["progress"])
+            Encoding.objects.get(id=self.encoding.id).save()
+            self.assertEqual(post_encode_actions.call_count, 1)
+
+    def test_new_file(self):
+        Encoding.objects.filter(id=self.encoding.id).update(status="success")
+        encoding = Encoding.objects.get(id=self.encoding.id)
+        with patch.object(Media, "post_encode_actions") as post_encode_actions:
+            encoding.media_file = "encoded/test.mp4"
+            encoding.save()
+            self.assertEqual(post_encode_actions.call_count, 1)
+
+
+class ThumbnailQueriesTestCase(TestCase):
+    """Listings load the thumbnails of their media without extra queries"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        for i in range(3):
+            media = create_media(self.user)
+            Media.objects.filter(id=media.id).update(thumbnail="thumbnails/test.jpg")
+            playlist = Playlist.objects.create(title="playlist", user=self.user)
+            PlaylistMedia.objects.create(playlist=playlist, media=media)
+            category = Category.objects.create(title="category {0}".format(i))
+            media.category.add(category)
+
+    def test_playlist_listing(self):
+        # the playlists with their user, and their first media
+        with self.assertNumQueries(2):
+            for playlist in Playlist.objects.for_listing():
+                self.assertTrue(playlist.thumbnail_url)
+
+    def test_category_fallback_thumbnails(self):
+        categories = list(Category.objects.all())
+        with self.assertNumQueries(1):
+            Category.set_fallback_thumbnails(categories)
+            for category in categories:
+                self.assertTrue(category.thumbnail_url)
+
+
+class SearchVectorTestCase(TestCase):
+    """The search vector of a media follows its tags"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.media = create_media(self.user)
+        self.tag = Tag.objects.create(title="newtag")
+
+    def search(self, text):
+        return Media.objects.filter(search=SearchQuery(text + ":*", search_type="raw"))
+
+    def test_tag_add_and_remove(self):
+        self.assertFalse(self.search("newtag").exists())
+
+        self.media.tags.add(self.tag)
+        self.assertTrue(self.search("newtag").exists())
+
+        self.media.tags.remove(self.tag)
+        self.assertFalse(self.search("newtag").exists())
+
+    def test_tag_clear(self):
+        self.media.tags.add(self.tag)
+        self.media.tags.clear()
+        self.assertFalse(self.search("newtag").exists())
+
+
+class RemoveFilesTestCase(TestCase):
+    """The files of a delete are removed in a single task, on commit"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.media = create_media(self.user)
+        profile = EncodeProfile.objects.create(name="h264-480", extension="mp4")
+        with patch.object(Media, "post_encode_actions"):
+            for resolution in (240, 480):
+                Encoding.objects.create(
+                    media=self.media,
+                    profile=profile,
+                    status="success",
+                    media_file="encoded/{0}.mp4".format(resolution),
+                )
+
+    def test_media_delete(self):
+        with patch("files.tasks.remove_media_files.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.media.delete()
+        self.assertEqual(delay.call_count, 1)
+        media_files = delay.call_args.kwargs["media_files"]
+        self.assertEqual(len(media_files), 3)
+        self.assertTrue(any(path.endswith("original/test.mp4") for path in media_files))
+
+
+class StripTagsTestCase(TestCase):
+    """Text is stripped of html tags when it is new or changed"""
+
+    def test_category(self):
+        category = Category.objects.create(title="<b>category</b>", description="<p>text</p>")
+        self.assertEqual(category.title, "category")
+        self.assertEqual(category.description, "text")
+
+        category = Category.objects.get(id=category.id)
+        with patch("files.models.strip_tags") as strip_tags:
+            category.save()
+        strip_tags.assert_not_called()
+
+        category.description = "<i>new</i> text"
+        category.save()
+        self.assertEqual(Category.objects.get(id=category.id).description, "new text")
+
+
+class MediaSaveTestCase(TestCase):
+    """media_save only refreshes what the saved fields can change"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        media = create_media(self.user)
+        self.category = Category.objects.create(title="category")
+        media.category.add(self.category)
+        self.media = Media.objects.get(id=media.id)
+        patcher = patch.object(Media, "transcribe_function")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_counter_save(self):
+        with patch.object(Category, "update_media_count") as update_media_count, patch.object(
+            Media, "update_search_vector"
+        ) as update_search_vector, patch.object(
+            User, "update_user_media"
+        ) as update_user_media:
+            self.media.views = 10
+            self.media.save(update_fields=["views"])
+        update_media_count.assert_not_called()
+        update_search_vector.assert_not_called()
+        update_user_media.assert_not_called()
+
+    def test_state_save(self):
+        self.assertEqual(Category.objects.get(id=self.category.id).media_count, 1)
+        self.media.state = "private"
+        self.media.save(update_fields=["state"])
+        self.assertEqual(Category.objects.get(id=self.category.id).media_count, 0)
+
+    def test_title_save(self):
+        self.media.title = "renamed"
+        self.media.save(update_fields=["title"])
+        self.assertTrue(
+            Media.objects.filter(
+                search=SearchQuery("renamed:*", search_type="raw")
+            ).exists()
+        )
+
+
+@override_settings(
+    UNLISTED_WORKFLOW_MAKE_PRIVATE_UPON_COMMENTARY_DELETE=True,
+    UNLISTED_WORKFLOW_MAKE_PUBLIC_UPON_COMMENTARY_ADD=False,
+)
+class CommentDeleteTestCase(TestCase):
+    """A public media goes unlisted when its last comment is deleted"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.media = create_media(self.user)
+        self.comment = Comment.objects.create(user=self.user, media=self.media, text="a")
+        self.other = Comment.objects.create(user=self.user, media=self.media, text="b")
+        patcher = patch.object(Media, "transcribe_function")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def state(self):
+        return Media.objects.get(id=self.media.id).state
+
+    def test_delete(self):
+        self.comment.delete()
+        self.assertEqual(self.state(), "public")
+
+        self.other.delete()
+        self.assertEqual(self.state(), "unlisted")
+
+
+class CreateEncodingsTestCase(TestCase):
+    """create_encodings inserts the encodings at once and sends them"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.media = create_media(self.user)
+        self.profiles = [
+            EncodeProfile.objects.create(name="h264-240", extension="mp4", resolution=240),
+            EncodeProfile.objects.create(name="h264-480", extension="mp4", resolution=480),
+        ]
+
+    def test_create_encodings(self):
+        with patch("files.tasks.encode_media.apply_async") as apply_async, patch.object(
+            Media, "post_encode_actions"
+        ) as post_encode_actions:
+            encodings = self.media.create_encodings(self.profiles)
+        self.assertEqual(len(encodings), 2)
+        self.assertEqual(
+            set(Encoding.objects.filter(media=self.media).values_list("status", flat=True)),
+            {"pending"},
+        )
+        self.assertEqual(apply_async.call_count, 2)
+        self.assertEqual(
+            {call.kwargs["args"][2] for call in apply_async.call_args_list},
+            {encoding.id for encoding in encodings},
+        )
+        post_encode_actions.assert_not_called()
+
+
+class ChunksConcatTestCase(TestCase):
+    """The encoded chunks of a media are joined in a single encoding"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, TEMP_DIRECTORY=tempfile.gettempdir()
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.media = create_media(self.user)
+        self.profile = EncodeProfile.objects.create(
+            name="h264-480", extension="mp4", resolution=480
+        )
+        self.chunks = [os.path.join(media_root, "chunk{0}.mp4".format(i)) for i in (1, 2)]
+        self.chunks_info = json.dumps({chunk: {} for chunk in self.chunks})
+
+    def add_chunk(self, i, status):
+        return Encoding.objects.create(
+            media=self.media,
+            profile=self.profile,
+            chunk=True,
+            chunks_info=self.chunks_info,
+            chunk_file_path=self.chunks[i],
+            media_file="encoded/chunk{0}.mp4".format(i),
+            status=status,
+            logs="log {0}".format(i),
+            worker="worker{0}".format(i),
+        )
+
+    def run_ffmpeg(self, cmd):
+        with open(cmd[-1], "wb") as f:
+            f.write(b"video")
+        return "concat"
+
+    def test_concat(self):
+        with patch.object(helpers, "run_command", side_effect=self.run_ffmpeg), patch.object(
+            Media, "post_encode_actions"
+        ) as post_encode_actions:
+            self.add_chunk(0, "success")
+            self.assertFalse(Encoding.objects.filter(chunk=False).exists())
+            self.add_chunk(1, "success")
+
+        encoding = Encoding.objects.get(media=self.media)
+        self.assertFalse(encoding.chunk)
+        self.assertEqual(encoding.status, "success")
+        self.assertEqual(encoding.progress, 100)
+        self.assertTrue(os.path.isfile(encoding.media_file.path))
+        self.assertLess(encoding.logs.index("log 0"), encoding.logs.index("log 1"))
+        self.assertEqual(
+            json.loads(encoding.worker), {"workers": ["worker0", "worker1"]}
+        )
+        # once, for the concatenated encoding, not for the chunks
+        self.assertEqual(post_encode_actions.call_count, 1)
@@ -669,7 +669,7 @@ class MediaList(APIView):
         if offset_param:
             media = media[int(offset_param) :]
         if show_param != "recommended":
-            media = media.prefetch_related("user")
+            media = media.for_listing().prefetch_related("user")
         page = paginator.paginate_queryset(media, request)
 
         serializer = MediaSerializer(page, many=True, context={"request": request})
@@ -696,11 +696,7 @@ class MediaDetail(APIView):
     def get_object(self, friendly_token, password=None):
         friendly_tone = clean_friendly_token(friendly_token)
         try:
-            media = (
-                Media.objects.select_related("user")
-                .prefetch_related("encodings__profile")
-                .get(friendly_token=friendly_token)
-            )
+            media = Media.objects.for_detail().get(friendly_token=friendly_token)
             # this need be explicitly called, and will call
             # has_object_permission() after has_permission has succeeded
             self.check_object_permissions(self.request, media)
@@ -1035,15 +1031,11 @@ class MediaSearch(APIView):
             media = media.filter(topics__title__contains=topic)
 
         if language:
-            language = {
-                value: key for key, value in dict(lists.video_languages).items()
-            }.get(language)
+            language = lists.video_languages_by_title.get(language)
             media = media.filter(media_language=language)
 
         if country:
-            country = {
-                value: key for key, value in dict(lists.video_countries).items()
-            }.get(country)
+            country = lists.video_countries_by_title.get(country)
             media = media.filter(media_country=country)
 
         if media_type:
@@ -1086,7 +1078,7 @@ class MediaSearch(APIView):
             media = media.values("title")[:40]
             return Response(media, status=status.HTTP_200_OK)
         else:
-            media = media.prefetch_related("user")
+            media = media.for_listing().prefetch_related("user")
             if category or tag:
                 pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
             else:
@@ -1137,7 +1129,7 @@ class PlaylistList(APIView):
     def get(self, request, format=None):
         pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
         paginator = pagination_class()
-        playlists = Playlist.objects.filter().prefetch_related("user")
+        playlists = Playlist.objects.for_listing()
 
         if "author" in self.request.query_params:
             author = self.request.query_params["author"].strip()
@@ -1358,14 +1350,14 @@ class EncodingDetail(APIView):
                 return Response({"status": "fail"}, status=status.HTTP_400_BAD_REQUEST)
             # TODO: break chunk True/False logic here
             if (
-                Encoding.objects.filter(
+                force == False
+                and Encoding.objects.filter(
                     media=media,
                     profile=profile,
                     chunk=chunk,
                     chunk_file_path=chunk_file_path,
-                ).count()
+                )[:2].count()
                 > 1
-                and force == False
             ):
                 Encoding.objects.filter(id=encoding_id).delete()
                 return Response({"status": "fail"}, status=status.HTTP_400_BAD_REQUEST)
@@ -1482,8 +1474,7 @@ class CommentList(APIView):
         pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
         paginator = pagination_class()
         comments = Comment.objects.filter(media__state="public").order_by("-add_date")
-        comments = comments.prefetch_related("user")
-        comments = comments.prefetch_related("media")
+        comments = comments.select_related("user", "media")
         params = self.request.query_params
         if "author" in params:
             author_param = params["author"].strip()
@@ -1591,7 +1582,8 @@ class UserActions(APIView):
         if action in VALID_USER_ACTIONS:
             if request.user.is_authenticated:
                 media = (
-                    Media.objects.select_related("user")
+                    Media.objects.for_listing()
+                    .select_related("user")
                     .filter(
                         mediaactions__user=request.user, mediaactions__action=action
                     )
@@ -1599,7 +1591,8 @@ class UserActions(APIView):
                 )
             elif request.session.session_key:
                 media = (
-                    Media.objects.select_related("user")
+                    Media.objects.for_listing()
+                    .select_related("user")
                     .filter(
                         mediaactions__session_key=request.session.session_key,
                         mediaactions__action=action,
@@ -1616,7 +1609,10 @@ class UserActions(APIView):
 
 class CategoryList(APIView):
     def get(self, request, format=None):
-        categories = Category.objects.filter().order_by("title")
+        categories = list(
+            Category.objects.filter().select_related("user").order_by("title")
+        )
+        Category.set_fallback_thumbnails(categories)
         serializer = CategorySerializer(
             categories, many=True, context={"request": request}
         )
@@ -11,7 +11,7 @@ from imagekit.models import ImageSpecField, ProcessedImageField
 from imagekit.processors import ResizeToFill, ResizeToFit
 
 import files.helpers as helpers
-from files.lists import video_countries
+from files.lists import video_countries, video_countries_by_code
 from files.models import Media, Tag
 
 
@@ -148,7 +148,7 @@ class User(AbstractUser):
     def location_info(self):
         ret = []
         location = (
-            dict(video_countries).get(self.location_country, None)
+            video_countries_by_code.get(self.location_country, None)
             if self.location_country
             else None
         )
@@ -194,7 +194,7 @@ class Channel(models.Model):
         if not self.friendly_token:
             while True:
                 friendly_token = helpers.produce_friendly_token()
-                if not Channel.objects.filter(friendly_token=friendly_token):
+                if not Channel.objects.filter(friendly_token=friendly_token).exists():
                     self.friendly_token = friendly_token
                     break
         super(Channel, self).save(*args, **kwargs)
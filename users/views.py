@@ -18,7 +18,7 @@ from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
 from cms.permissions import IsUserOrManager
-from files.lists import video_countries
+from files.lists import video_countries_by_title
 from files.methods import is_mediacms_editor, is_mediacms_manager
 
 from .forms import ChannelForm, UserForm
@@ -224,9 +224,7 @@ class UserList(APIView):
         )
         location = request.GET.get("location", "").strip()
         if location:
-            location = {value: key for key, value in dict(video_countries).items()}.get(
-                location
-            )
+            location = video_countries_by_title.get(location)
             users = users.filter(location_country=location)
 
         page = paginator.paginate_queryset(users, request)